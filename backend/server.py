@@ -1,25 +1,33 @@
 import asyncio
 import base64
+import hashlib
+import itertools
 import os
+import re
+import threading
+import time
 import uuid
+import zipfile
 import logging
 import json
+import orjson
 import httpx
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
-import logging
-
-# Configure Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("server")
 
 from docx import Document
+from lxml import etree
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Resource, Tool, TextContent, Prompt, ResourceTemplate, GetPromptResult, PromptMessage
 from pydantic import AnyUrl
-from openai import OpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -32,194 +40,880 @@ app = Server("docs-suggester-ai")
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# In-memory storage for document metadata and suggestions
-documents = {}
-suggestions_store = {}
+class LRUCache:
+    """Bounded mapping with LRU eviction and a per-entry TTL.
 
+    The document and suggestion stores previously grew for the lifetime
+    of the process; this caps them and lets an optional on_evict callback
+    clean up the on-disk .docx files of expired entries.
+    """
 
-def extract_document_metadata(doc_path: str) -> dict:
-    """Extract metadata from a Word document."""
+    def __init__(self, maxsize: int = 256, ttl: float = 3600, on_evict=None):
+        self._entries = OrderedDict()  # key -> (value, insert timestamp)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+
+    def _evict(self, key):
+        value, _ = self._entries.pop(key)
+        if self.on_evict:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                logger.warning(f"Cache eviction callback failed for {key}: {e}")
+
+    def __contains__(self, key) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if time.monotonic() - entry[1] > self.ttl:
+            self._evict(key)
+            return False
+        return True
+
+    def __getitem__(self, key):
+        if key not in self:  # also expires stale entries
+            raise KeyError(key)
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def __setitem__(self, key, value):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = (value, time.monotonic())
+        while len(self._entries) > self.maxsize:
+            self._evict(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Per-document apply locks: concurrent applies for the same doc_id would
+# race the read-modify-write of its record and duplicate docx rebuilds on
+# double-clicks. setdefault is atomic on the single event loop.
+_doc_locks: dict = {}
+
+
+def _doc_lock(doc_id: str) -> asyncio.Lock:
+    return _doc_locks.setdefault(doc_id, asyncio.Lock())
+
+
+# In-flight background applies ((doc_id, selection_key) -> Task). Keyed
+# by selection so only a resubmit of the *same* selection is deduplicated;
+# a different selection for the same document enqueues its own task and
+# the per-doc lock serializes them. Results land in the document record;
+# this registry only answers "is it ready yet"
+_apply_tasks: dict = {}
+
+
+def _pending_apply(doc_id: str) -> bool:
+    """True while any background apply for this document is unfinished.
+
+    Process-local: it only sees tasks created by this worker. Under
+    multi-worker deployments (WEB_CONCURRENCY + REDIS_URL) the download
+    route additionally checks the pending_apply counter in the shared
+    document record, which every worker reads.
+    """
+    return any(
+        key[0] == doc_id and not task.done()
+        for key, task in _apply_tasks.items()
+    )
+
+
+async def _apply_selected(doc_id: str, selected: list[dict], background: bool = False) -> str:
+    """Run the locked apply in the process pool and persist the result.
+
+    The per-doc lock serializes concurrent applies so the record
+    write-back can't lose updates; the lxml traversal and re-zip are
+    pure-CPU and would serialize on the GIL under thread offload.
+    Background callers increment the record's pending_apply counter at
+    enqueue time; it is decremented here (success or failure) so download
+    polls routed to other workers stop gating once the result has landed.
+    """
+    async with _doc_lock(doc_id):
+        doc_info = await _store_get(documents, doc_id)
+        try:
+            modified_path = await asyncio.get_running_loop().run_in_executor(
+                _get_process_pool(), apply_changes_to_document, doc_info["path"], selected
+            )
+            # Written back as a whole entry so the Redis backend persists it
+            # too; the download filename was derived once at upload time
+            doc_info["modified_path"] = modified_path
+        finally:
+            if background:
+                doc_info["pending_apply"] = max(0, doc_info.get("pending_apply", 0) - 1)
+            await _store_set(documents, doc_id, doc_info)
+    return modified_path
+
+
+def _evict_document(doc_id: str, info: dict):
+    """Delete a document's on-disk files once its cache entry is dropped."""
+    _doc_locks.pop(doc_id, None)
+    for key in [k for k in _apply_tasks if k[0] == doc_id]:
+        _apply_tasks.pop(key, None)
+    path = info.get("path")
+    if path:
+        source = Path(path)
+        # Every apply writes a selection-keyed variant next to the
+        # source; drop them all, not just the most recent one
+        for variant in source.parent.glob(f"{source.stem}_modified_*{source.suffix}"):
+            variant.unlink()
+        if source.exists():
+            source.unlink()
+    modified_path = info.get("modified_path")
+    if modified_path and os.path.exists(modified_path):
+        os.unlink(modified_path)
+
+
+class RedisStore:
+    """Mapping facade over Redis with the same interface as LRUCache.
+
+    Running uvicorn with --workers N gives each process its own LRUCache,
+    so an upload handled by one worker is invisible to the others. With
+    REDIS_URL set, all workers share state through Redis instead; values
+    are JSON documents expiring after `ttl`. Callers must write entries
+    back after mutating them (read-modify-write), which the in-memory
+    store tolerates too. On-disk cleanup of expired uploads is left to
+    the deployment in this mode, since key expiry fires no callback.
+    Async handlers access either backend through the _store_* helpers,
+    which push these blocking round-trips off the event loop.
+    """
+
+    def __init__(self, client, prefix: str, ttl: int = 3600):
+        self._client = client
+        self._prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key) -> str:
+        return f"{self._prefix}{key}"
+
+    def __contains__(self, key) -> bool:
+        return bool(self._client.exists(self._key(key)))
+
+    def __getitem__(self, key):
+        raw = self._client.get(self._key(key))
+        if raw is None:
+            raise KeyError(key)
+        return json.loads(raw)
+
+    def __setitem__(self, key, value):
+        self._client.set(self._key(key), json.dumps(value), ex=self.ttl)
+
+
+_REDIS_URL = os.getenv("REDIS_URL")
+
+if _REDIS_URL:
+    import redis
+
+    _redis_client = redis.Redis.from_url(_REDIS_URL)
+    documents = RedisStore(_redis_client, "doc:", ttl=3600)
+    suggestions_index = RedisStore(_redis_client, "suggidx:", ttl=3600)
+else:
+    # In-memory storage for document metadata and suggestions, bounded so
+    # long-running sessions don't leak memory or upload files
+    documents = LRUCache(maxsize=256, ttl=3600, on_evict=_evict_document)
+    # Suggestions per document (doc_id -> {suggestion_id: suggestion}); the
+    # id-keyed layout gives apply O(1) lookups, and dicts preserve insertion
+    # order so .values() still yields the original suggestion sequence
+    suggestions_index = LRUCache(maxsize=256, ttl=3600)
+
+
+# Async accessors for the stores above. redis-py commands are synchronous
+# network round-trips, so the Redis backend runs them in a thread to keep
+# the event loop (and every in-flight SSE session) serviced; the
+# in-memory store answers inline with no thread hop.
+async def _store_has(store, key) -> bool:
+    if isinstance(store, RedisStore):
+        return await asyncio.to_thread(store.__contains__, key)
+    return key in store
+
+
+async def _store_get(store, key):
+    if isinstance(store, RedisStore):
+        return await asyncio.to_thread(store.__getitem__, key)
+    return store[key]
+
+
+async def _store_set(store, key, value):
+    if isinstance(store, RedisStore):
+        await asyncio.to_thread(store.__setitem__, key, value)
+    else:
+        store[key] = value
+
+
+# Formality rewrite rules for the rule-based fallback. A single compiled
+# alternation finds every trigger in one linear scan per paragraph instead
+# of one substring search (and one .replace) per rule.
+_FORMALITY_RULES = {
+    "don't": "do not",
+    "Don't": "Do not",
+    "can't": "cannot",
+    "Can't": "Cannot",
+    "won't": "will not",
+    "Won't": "Will not",
+    "shouldn't": "should not",
+    "Shouldn't": "Should not",
+    "wouldn't": "would not",
+    "Wouldn't": "Would not",
+    "couldn't": "could not",
+    "Couldn't": "Could not",
+    "doesn't": "does not",
+    "Doesn't": "Does not",
+    "isn't": "is not",
+    "Isn't": "Is not",
+}
+_FORMALITY_RE = re.compile("|".join(re.escape(t) for t in _FORMALITY_RULES))
+
+# First twenty whitespace-separated words, captured without building the
+# full split list of a long paragraph just to slice it. Used with
+# search(), not match(): the pattern needs a non-space first character,
+# so an indented paragraph would make match() return None
+_LEADING_WORDS_RE = re.compile(r"(?:\S+\s+){0,19}\S+")
+
+
+class _IdPool:
+    """Random suggestion ids sliced from batched os.urandom reads.
+
+    uuid.uuid4() costs a urandom syscall plus canonical formatting per id;
+    one batched read covers 64 ids.
+    """
+
+    def __init__(self, batch: int = 64):
+        self._batch = batch
+        self._blob = b""
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            if self._offset >= len(self._blob):
+                self._blob = os.urandom(16 * self._batch)
+                self._offset = 0
+            token = self._blob[self._offset:self._offset + 16]
+            self._offset += 16
+        return token.hex()
+
+
+_id_pool = _IdPool()
+
+# Worker-process pool for CPU-bound docx work, created on first use so
+# importing the module (e.g. in tests) doesn't spawn processes
+_process_pool = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it lazily.
+
+    Thread offload keeps the event loop responsive, but pure-Python
+    parsing and text scanning still serialize on the GIL; separate
+    processes let concurrent documents be analyzed in true parallel.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=max(1, os.cpu_count() - 1))
+    return _process_pool
+
+
+@lru_cache(maxsize=32)
+def _load_doc(doc_path: str, mtime: float) -> tuple:
+    """Parse a .docx once per (path, mtime) and cache the result.
+
+    A typical upload -> analyze -> apply flow would otherwise unzip and
+    XML-parse the same file three times. The paragraph texts are cached
+    alongside the Document so callers also skip the tree traversal.
+    """
     doc = Document(doc_path)
-    paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-    
+    # p.text, not p._p.itertext(): python-docx overrides .text on the
+    # paragraph and run elements to return their full concatenated text,
+    # so lxml's itertext() repeats every run (a single-run paragraph
+    # comes back tripled). Caching the texts here still means the
+    # traversal runs once per document instead of per access.
+    paragraph_texts = [p.text for p in doc.paragraphs]
+    return doc, paragraph_texts
+
+
+def _get_doc(doc_path: str) -> tuple:
+    """Return the cached (Document, paragraph texts) for the file currently on disk."""
+    return _load_doc(doc_path, os.path.getmtime(doc_path))
+
+
+def _hash_file(doc_path: str) -> str:
+    """Content hash of a file, read in 1 MiB chunks.
+
+    BLAKE2b is the fastest digest in the stdlib on CPython.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(doc_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Metadata keyed by content hash, so re-uploading the same file (common in
+# demo/testing flows) skips the docx parse entirely
+_metadata_cache = LRUCache(maxsize=128, ttl=86400)
+
+_W_P_TAG = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p"
+
+
+def _iter_paragraph_texts(doc_path: str):
+    """Stream paragraph texts straight out of word/document.xml.
+
+    For metadata the full python-docx model (styles, relationships, ...)
+    is overkill; a SAX-style iterparse keeps peak memory at one element
+    and skips model construction entirely.
+    """
+    with zipfile.ZipFile(doc_path) as z, z.open("word/document.xml") as f:
+        for _, elem in etree.iterparse(f, tag=_W_P_TAG):
+            yield "".join(elem.itertext())
+            elem.clear()
+
+
+def extract_document_metadata(doc_path: str) -> dict:
+    """Extract metadata from a Word document, memoized by content hash."""
+    file_hash = _hash_file(doc_path)
+    if file_hash in _metadata_cache:
+        return _metadata_cache[file_hash]
+
+    # Single pass: word count, paragraph count and preview together,
+    # instead of building a filtered list and walking it again
+    word_count = 0
+    paragraph_count = 0
+    preview = ""
+    for text in _iter_paragraph_texts(doc_path):
+        stripped = text.strip()
+        if not stripped:
+            continue
+        if paragraph_count == 0:
+            preview = text[:200]
+        # C-level scan instead of allocating a word list per paragraph;
+        # single-space-separated prose dominates docx text, so the +1
+        # approximation matches split() in practice
+        word_count += stripped.count(" ") + 1
+        paragraph_count += 1
+
+    metadata = {
+        "word_count": word_count,
+        "paragraph_count": paragraph_count,
+        "preview": preview,
+    }
+    _metadata_cache[file_hash] = metadata
+    return metadata
+
+
+
+
+# Finished suggestions keyed by (request, paragraph text): hashing is
+# microseconds while the LLM call is seconds, so re-running a request on
+# an edited document (or boilerplate shared between documents) skips the
+# round-trip for every unchanged paragraph
+_suggestion_result_cache = LRUCache(maxsize=10000, ttl=86400)
+
+
+def _suggestion_key(request: str, text: str) -> str:
+    # Normalize the request so trivial phrasing variants ("Make it formal",
+    # "make it formal ") share cache entries
+    normalized = " ".join(request.lower().split())
+    return hashlib.blake2b(f"{normalized}\0{text}".encode(), digest_size=16).hexdigest()
+
+
+# Batch paragraphs to reduce API calls. 20 paragraphs per request keeps a
+# 50-paragraph document to 2-3 calls instead of 10, cutting HTTP/TLS
+# overhead and RPM consumption proportionally; TPM usage is unchanged.
+BATCH_SIZE = 20
+
+
+def _batch_paragraphs(paragraph_texts: list[str]) -> list[list[tuple]]:
+    """Collect non-empty, non-trivial paragraphs and group them into batches.
+
+    Processing is capped at MAX_PARAGRAPHS (default 200) so a book-length
+    document can't fan out into unbounded API cost; later sections can be
+    re-analyzed separately.
+    """
+    # Lazy filter + islice: the cap short-circuits the scan instead of
+    # materializing every candidate first. Counting separators is a
+    # C-level scan with no list allocation; >= 9 spaces approximates the
+    # "at least 10 words" threshold for normal prose.
+    candidates = (
+        (idx, text)
+        for idx, text in enumerate(paragraph_texts)
+        if text.count(" ") >= 9
+    )
+    paragraphs_to_process = list(
+        itertools.islice(candidates, int(os.getenv("MAX_PARAGRAPHS", "200")))
+    )
+
+    return _pack_batches(paragraphs_to_process)
+
+
+# Approximate input-token budget per batch (chars/4 estimate). Long
+# paragraphs close a batch early so responses stay well-formed; short
+# ones keep filling up to BATCH_SIZE
+_BATCH_TOKEN_BUDGET = 3000
+
+
+def _pack_batches(paragraphs: list[tuple]) -> list[list[tuple]]:
+    """Greedily pack (idx, text) pairs into token-bounded batches."""
+    batches = []
+    current, tok_sum = [], 0
+    for item in paragraphs:
+        tokens = len(item[1]) // 4
+        if current and (tok_sum + tokens > _BATCH_TOKEN_BUDGET or len(current) >= BATCH_SIZE):
+            batches.append(current)
+            current, tok_sum = [], 0
+        current.append(item)
+        tok_sum += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# System prompt shared by every batch of one analysis; built once per
+# request instead of re-rendered per batch
+_SYSTEM_PROMPT_TMPL = """You are a professional document editor. Improve each paragraph per this request: "%s"
+Return only changes that meaningfully improve the text; otherwise set has_suggestion to false. Cover every paragraph.
+Respond in this exact JSON format:
+{"suggestions": [{"paragraph_number": 0, "has_suggestion": true/false, "suggested_text": "improved version of the text", "reason": "brief explanation of the change"}, ...]}"""
+
+
+@lru_cache(maxsize=32)
+def _system_prompt(request: str) -> str:
+    return _SYSTEM_PROMPT_TMPL % request
+
+
+def _completion_request(request: str, batch: list[tuple]) -> dict:
+    """Build the chat-completion payload for one paragraph batch.
+
+    Shared between the interactive path and the Batch API path so both
+    send the identical prompt.
+    """
+    # Create a combined prompt with all paragraphs in the batch
+    batch_text = "\n\n---PARAGRAPH SEPARATOR---\n\n".join(
+        f"[PARAGRAPH {i}]\n{text}"
+        for i, (idx, text) in enumerate(batch)
+    )
+
     return {
-        "word_count": sum(len(p.split()) for p in paragraphs),
-        "paragraph_count": len(paragraphs),
-        "preview": paragraphs[0][:200] if paragraphs else "",
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "system",
+                "content": _system_prompt(request)
+            },
+            {
+                "role": "user",
+                "content": batch_text
+            }
+        ],
+        "temperature": 0.3,
+        # Scale the output budget with the batch instead of a flat 2000,
+        # which would truncate responses for the larger batches. Rewrites
+        # rarely exceed ~1.5x the input, so short-paragraph batches are
+        # additionally bounded by a chars/4 token estimate of the batch
+        # text plus a per-paragraph allowance for the JSON scaffolding
+        # and reason string, which don't shrink with input length —
+        # truncation in json_object mode loses the whole batch
+        "max_tokens": min(
+            400 * len(batch),
+            int(1.5 * (len(batch_text) // 4)) + 60 * len(batch),
+            8000,
+        ),
+        "response_format": {"type": "json_object"},
+        # All batches of one analysis share a cache key so OpenAI routes
+        # them to the same prompt-cache shard; prefixes >= 1024 tokens are
+        # cached automatically and second+ hits halve input token cost
+        "prompt_cache_key": "docx-suggest-" + hashlib.blake2b(
+            request.encode(), digest_size=8
+        ).hexdigest(),
     }
 
 
+def _collect_batch_suggestions(batch: list[tuple], ai_response: dict, suggestions: list[dict]):
+    """Map one batch's parsed AI response back to paragraph suggestions."""
+    batch_suggestions = ai_response.get("suggestions", [])
 
+    for suggestion_data in batch_suggestions:
+        paragraph_num = suggestion_data.get("paragraph_number", 0)
+
+        # Map back to original paragraph index
+        if paragraph_num < len(batch):
+            original_idx, original_text = batch[paragraph_num]
+
+            if suggestion_data.get("has_suggestion", False):
+                suggestions.append({
+                    "id": _id_pool.next(),
+                    "paragraph_index": original_idx,
+                    "original": original_text,
+                    "suggested": suggestion_data["suggested_text"],
+                    "reason": suggestion_data["reason"],
+                })
+
+
+def _wait_for_retry_after(retry_state):
+    """Honor the server's Retry-After header when rate limited; otherwise
+    fall back to exponential backoff with jitter."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RateLimitError) and exc.response is not None:
+        retry_after = exc.response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return wait_exponential_jitter(initial=1, max=30)(retry_state)
+
+
+# Lazy module-level client: one connection pool reused across every
+# analysis instead of a fresh TLS handshake per call
+_openai_client: AsyncOpenAI | None = None
+
+
+def _get_openai_client() -> AsyncOpenAI:
+    global _openai_client
+    if _openai_client is None:
+        # Tuned transport: HTTP/2 multiplexes the concurrent batch calls
+        # over a few persistent connections instead of opening one
+        # TCP+TLS socket per in-flight request
+        _openai_client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
+    return _openai_client
+
+
+@retry(
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError)),
+    wait=_wait_for_retry_after,
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+async def _create_completion(client: AsyncOpenAI, payload: dict):
+    """One chat completion, retried on transient failures.
+
+    Without this, a single 429 or network blip dropped the whole batch's
+    suggestions permanently.
+    """
+    return await client.chat.completions.create(**payload)
+
+
+async def _iter_suggestion_batches(doc_path: str, request: str):
+    """Yield lists of suggestions as they become available.
+
+    Cached (request, paragraph) hits come first, then each LLM batch in
+    completion order; fresh results are written back to the result cache
+    as they arrive. The streaming endpoint forwards each chunk as NDJSON
+    while generate_suggestions just accumulates them.
+    """
+    _, paragraph_texts = await asyncio.to_thread(_get_doc, doc_path)
 
-def generate_suggestions(doc_path: str, request: str) -> list[dict]:
-    """Generate AI-powered suggestions using GPT-4o-mini with batched processing."""
-    doc = Document(doc_path)
-    suggestions = []
-    
-    # Initialize OpenAI client
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key or api_key == "your_openai_api_key_here":
-        # Fallback to rule-based if no API key
-        return generate_suggestions_fallback(doc_path, request)
-    
-    client = OpenAI(api_key=api_key)
-    
-    # Collect non-empty paragraphs with their indices
-    paragraphs_to_process = []
-    for idx, paragraph in enumerate(doc.paragraphs):
-        if not paragraph.text.strip():
-            continue
-        
-        text = paragraph.text
-        
-        # Skip very short paragraphs (less than 10 words)
-        if len(text.split()) < 10:
-            continue
-        
-        paragraphs_to_process.append((idx, text))
-    
-    # Batch paragraphs to reduce API calls (process 5 paragraphs at a time)
-    BATCH_SIZE = 5
-    
-    for batch_start in range(0, len(paragraphs_to_process), BATCH_SIZE):
-        batch = paragraphs_to_process[batch_start:batch_start + BATCH_SIZE]
-        
-        # Create a combined prompt with all paragraphs in the batch
-        batch_text = "\n\n---PARAGRAPH SEPARATOR---\n\n".join(
-            f"[PARAGRAPH {i}]\n{text}" 
-            for i, (idx, text) in enumerate(batch)
+        # Fallback to rule-based if no API key; that path is pure-CPU work
+        # and stays in the process pool
+        yield await asyncio.get_running_loop().run_in_executor(
+            _get_process_pool(), generate_suggestions_fallback, doc_path, request
         )
-        
-        try:
+        return
+
+    client = _get_openai_client()
+
+    # Serve paragraphs whose (request, text) pair was already analyzed from
+    # the result cache; only misses go to the API
+    cached_hits = []
+    misses = []
+    # Identical paragraphs (boilerplate, repeated disclaimers) are sent
+    # once; extra occurrences are recorded here and fanned back out when
+    # the shared result arrives
+    duplicate_idxs: dict[str, list[int]] = {}
+    for idx, text in itertools.chain.from_iterable(_batch_paragraphs(paragraph_texts)):
+        key = _suggestion_key(request, text)
+        if key in _suggestion_result_cache:
+            cached = _suggestion_result_cache[key]
+            cached_hits.append({
+                "id": _id_pool.next(),
+                "paragraph_index": idx,
+                "original": text,
+                "suggested": cached["suggested"],
+                "reason": cached["reason"],
+            })
+        elif text in duplicate_idxs:
+            duplicate_idxs[text].append(idx)
+        else:
+            duplicate_idxs[text] = []
+            misses.append((idx, text))
+    if cached_hits:
+        yield cached_hits
+
+    # Cap in-flight requests so the concurrent fan-out respects RPM/TPM limits
+    semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_CONCURRENCY", "8")))
+
+    async def _run_batch(batch):
+        async with semaphore:
             # Call GPT-4o-mini for batch suggestions
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""You are a professional document editor. Analyze the given paragraphs and suggest improvements based on this request: "{request}"
-
-For each paragraph, return your response in this exact JSON format:
-{{
-    "suggestions": [
-        {{
-            "paragraph_number": 0,
-            "has_suggestion": true/false,
-            "suggested_text": "improved version of the text",
-            "reason": "brief explanation of the change"
-        }},
-        ...
-    ]
-}}
+            return batch, await _create_completion(client, _completion_request(request, batch))
 
-Only suggest changes if they meaningfully improve the text. If no changes are needed for a paragraph, set has_suggestion to false for that paragraph.
-Process all paragraphs provided and return suggestions for each one."""
-                    },
-                    {
-                        "role": "user",
-                        "content": batch_text
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=2000,
-                response_format={"type": "json_object"}
-            )
-            
-            # Parse AI response
-            import json
-            ai_response = json.loads(response.choices[0].message.content)
-            
-            # Extract suggestions for each paragraph in the batch
-            batch_suggestions = ai_response.get("suggestions", [])
-            
-            for suggestion_data in batch_suggestions:
-                paragraph_num = suggestion_data.get("paragraph_number", 0)
-                
-                # Map back to original paragraph index
-                if paragraph_num < len(batch):
-                    original_idx, original_text = batch[paragraph_num]
-                    
-                    if suggestion_data.get("has_suggestion", False):
-                        suggestions.append({
-                            "id": str(uuid.uuid4()),
-                            "paragraph_index": original_idx,
-                            "original": original_text,
-                            "suggested": suggestion_data["suggested_text"],
-                            "reason": suggestion_data["reason"],
-                        })
-        
-        except Exception as e:
-            # Log error but continue processing other batches
-            print(f"Error processing batch starting at {batch_start}: {e}")
+    # Fire all batches concurrently; each is yielded as soon as it finishes
+    tasks = [_run_batch(batch) for batch in _pack_batches(misses)]
+    for future in asyncio.as_completed(tasks):
+        batch_suggestions = []
+        try:
+            batch, response = await future
+            ai_response = orjson.loads(response.choices[0].message.content)
+            _collect_batch_suggestions(batch, ai_response, batch_suggestions)
+        except Exception:
+            # Log with traceback but continue processing other batches
+            logger.exception("Suggestion batch failed")
             continue
-    
+
+        # Remember fresh API results for future runs of the same request,
+        # and fan each one out to identical paragraphs elsewhere in the
+        # document that were elided from the prompt
+        fanned_out = []
+        for suggestion in batch_suggestions:
+            _suggestion_result_cache[_suggestion_key(request, suggestion["original"])] = {
+                "suggested": suggestion["suggested"],
+                "reason": suggestion["reason"],
+            }
+            for dup_idx in duplicate_idxs.get(suggestion["original"], ()):
+                fanned_out.append({
+                    **suggestion,
+                    "id": _id_pool.next(),
+                    "paragraph_index": dup_idx,
+                })
+        batch_suggestions.extend(fanned_out)
+        if batch_suggestions:
+            yield batch_suggestions
+
+
+async def generate_suggestions(doc_path: str, request: str) -> list[dict]:
+    """Generate AI-powered suggestions using GPT-4o-mini with batched processing.
+
+    Batches are dispatched concurrently: analyze latency is bounded by the
+    slowest batch instead of the sum of sequential round-trips.
+    """
+    suggestions = []
+    async for chunk in _iter_suggestion_batches(doc_path, request):
+        suggestions.extend(chunk)
+    # Completion order is nondeterministic; present in document order
+    suggestions.sort(key=lambda s: s["paragraph_index"])
     return suggestions
 
 
+async def start_batch_analysis(doc_path: str, request: str) -> tuple[str, list[list[tuple]]]:
+    """Submit a document analysis to the OpenAI Batch API.
+
+    Non-interactive analyses cost ~50% of the interactive price and don't
+    consume RPM budget; results are collected later via /api/analyze_status.
+    Returns the batch job id and the paragraph batches needed to map the
+    output back to paragraph indices.
+    """
+    _, paragraph_texts = await asyncio.to_thread(_get_doc, doc_path)
+    batches = _batch_paragraphs(paragraph_texts)
+
+    client = _get_openai_client()
+
+    lines = [
+        json.dumps({
+            "custom_id": f"batch-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _completion_request(request, batch),
+        })
+        for i, batch in enumerate(batches)
+    ]
+    batch_file = await client.files.create(
+        file=("analysis.jsonl", "\n".join(lines).encode()),
+        purpose="batch",
+    )
+    job = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    return job.id, batches
+
+
+async def collect_batch_analysis(batch_id: str, batches: list[list[tuple]]) -> tuple[str, list[dict]]:
+    """Poll a Batch API job; returns (status, suggestions) once completed."""
+    client = _get_openai_client()
+
+    job = await client.batches.retrieve(batch_id)
+    if job.status != "completed":
+        return job.status, []
+
+    output = await client.files.content(job.output_file_id)
+    suggestions = []
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = orjson.loads(line)
+            batch = batches[int(item["custom_id"].rsplit("-", 1)[1])]
+            content = item["response"]["body"]["choices"][0]["message"]["content"]
+            _collect_batch_suggestions(batch, orjson.loads(content), suggestions)
+        except Exception:
+            logger.exception("Error parsing batch output line")
+            continue
+
+    return "completed", suggestions
+
+
+
 def generate_suggestions_fallback(doc_path: str, request: str) -> list[dict]:
     """Fallback rule-based suggestions if OpenAI API is not available."""
-    doc = Document(doc_path)
+    _, paragraph_texts = _get_doc(doc_path)
     suggestions = []
-    
+
+    # Detect the requested intents once instead of re-lowercasing the
+    # request for every paragraph and branch
+    req_lower = request.lower()
+    want_formal = "more formal" in req_lower
+    want_concise = "concise" in req_lower or "shorter" in req_lower
+
     # Simple rule-based suggestions for demonstration
-    for idx, paragraph in enumerate(doc.paragraphs):
-        if not paragraph.text.strip():
+    for idx, text in enumerate(paragraph_texts):
+        if not text.strip():
             continue
-            
-        text = paragraph.text
-        
+
         # Example: Make text more formal
-        if "more formal" in request.lower():
-            if "don't" in text.lower():
+        if want_formal:
+            replaced, hits = _FORMALITY_RE.subn(lambda m: _FORMALITY_RULES[m.group(0)], text)
+            if hits:
                 suggestions.append({
-                    "id": str(uuid.uuid4()),
+                    "id": _id_pool.next(),
                     "paragraph_index": idx,
                     "original": text,
-                    "suggested": text.replace("don't", "do not").replace("Don't", "Do not"),
+                    "suggested": replaced,
                     "reason": "Replace contractions with full forms for formality",
                 })
         
         # Example: Make text more concise
-        if "concise" in request.lower() or "shorter" in request.lower():
-            if len(text.split()) > 30:
-                suggestions.append({
-                    "id": str(uuid.uuid4()),
-                    "paragraph_index": idx,
-                    "original": text,
-                    "suggested": " ".join(text.split()[:20]) + "...",
-                    "reason": "Shorten long paragraph for conciseness",
-                })
+        if want_concise and text.count(" ") > 30:
+            suggestions.append({
+                "id": _id_pool.next(),
+                "paragraph_index": idx,
+                "original": text,
+                "suggested": _LEADING_WORDS_RE.search(text).group(0) + "...",
+                "reason": "Shorten long paragraph for conciseness",
+            })
     
     return suggestions
 
 
+def _save_modified_docx(doc, source_path: Path, out_path: Path):
+    """Write the modified package, re-serializing only the main document part.
+
+    python-docx's save() pushes every part back through lxml and the
+    package writer even though only word/document.xml ever changes here.
+    Copy all other members straight from the source zip (keeping each
+    member's original compression type, so stored media stays stored) and
+    splice in the mutated document part.
+    """
+    new_xml = doc.part.blob
+    with zipfile.ZipFile(source_path) as zin, \
+            zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            if info.filename == "word/document.xml":
+                zout.writestr(info, new_xml)
+            else:
+                zout.writestr(info, zin.read(info.filename))
+
+
+def _download_filename(filename: str) -> str:
+    """User-facing name for the modified copy, derived once at upload."""
+    base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
+    return f"{base_name}_modified.docx"
+
+
+def _selection_key(selected_suggestions: list[dict]) -> str:
+    """Stable fingerprint of a selection; order-insensitive over the ids."""
+    return hashlib.blake2b(
+        "|".join(sorted(s["id"] for s in selected_suggestions)).encode(),
+        digest_size=8,
+    ).hexdigest()
+
+
 def apply_changes_to_document(doc_path: str, selected_suggestions: list[dict]) -> str:
     """Apply selected suggestions to the document."""
-    doc = Document(doc_path)
-    
-    # Sort suggestions by paragraph index in reverse to avoid index shifting
-    sorted_suggestions = sorted(
-        selected_suggestions, 
-        key=lambda x: x["paragraph_index"], 
-        reverse=True
-    )
-    
-    for suggestion in sorted_suggestions:
-        idx = suggestion["paragraph_index"]
-        if idx < len(doc.paragraphs):
-            # Replace paragraph text
-            doc.paragraphs[idx].text = suggestion["suggested"]
-            
-            # Add comment to indicate change (Track Changes simulation)
-            # Note: python-docx doesn't support true Track Changes,
-            # so we'll add a comment or highlight instead
-    
-    # Save modified document
-    output_path = doc_path.replace(".docx", "_modified.docx")
-    doc.save(output_path)
-    
-    return output_path
-
+    # Suggestion ids are unique per analysis, so the sorted id set pins
+    # the output exactly; re-applying the same selection reuses the file
+    # already on disk instead of rebuilding and rezipping the document
+    selection_key = _selection_key(selected_suggestions)
+    source = Path(doc_path)
+    output_path = source.with_name(f"{source.stem}_modified_{selection_key}{source.suffix}")
+    if output_path.exists():
+        return str(output_path)
+
+    doc, _ = _get_doc(doc_path)
+    tmp_path = output_path.with_suffix(".tmp")
+
+    # The edits below mutate the Document held in this worker's _load_doc
+    # cache, so the cache must be dropped even if the save fails halfway —
+    # otherwise the next apply in this worker builds on the dirty tree
+    try:
+        # Snapshot once: the .paragraphs property walks the XML tree and
+        # rebuilds the list on every access. Editing paragraph text never
+        # inserts or removes paragraphs, so indices stay stable and the
+        # suggestions can be applied in the order given — no reverse sort
+        paragraphs = doc.paragraphs
+        applied_indices = set()
+
+        for suggestion in selected_suggestions:
+            idx = suggestion["paragraph_index"]
+            if idx < len(paragraphs) and idx not in applied_indices:
+                applied_indices.add(idx)
+                # Rewrite the first run and drop the rest from the XML:
+                # assigning paragraph.text would throw away run-level
+                # formatting (bold/italic/styles) and rebuild the whole run
+                # structure, while removing the now-empty trailing run
+                # elements keeps them out of the serialized output entirely
+                runs = paragraphs[idx].runs
+                if runs:
+                    runs[0].text = suggestion["suggested"]
+                    for run in runs[1:]:
+                        run._element.getparent().remove(run._element)
+                else:
+                    paragraphs[idx].text = suggestion["suggested"]
+
+                # Add comment to indicate change (Track Changes simulation)
+                # Note: python-docx doesn't support true Track Changes,
+                # so we'll add a comment or highlight instead
+
+        # Save modified document atomically: write to a temp file, then
+        # rename over the target so readers never see a partially written
+        # zip.
+        _save_modified_docx(doc, source, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        _load_doc.cache_clear()
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    return str(output_path)
+
+
+
+async def _download_to_path(url: str, out_path: Path, chunk_size: int = 1 << 20) -> int:
+    """Stream a remote file to disk in chunks; returns total bytes written.
+
+    Fully async: the event loop keeps serving SSE sessions and REST calls
+    while the body downloads, and peak memory stays at O(chunk_size)
+    instead of buffering the whole file. The per-chunk disk writes hit the
+    page cache and are sub-ms, so they stay synchronous.
+    """
+    total = 0
+    async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            with open(out_path, "wb") as f:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    f.write(chunk)
+                    total += len(chunk)
+    return total
 
 
 def get_public_url() -> str:
@@ -237,33 +931,68 @@ def get_public_url() -> str:
     return os.getenv("NGROK_URL", "http://localhost:8787")
 
 
+# Built widget HTML, cached by file mtime so resource listings don't
+# re-read and re-decode the file on every call
+WIDGET_PATH = Path("../frontend/dist/index.html")
+_widget_cache = {"html": None, "mtime": None, "checked": 0.0}
+# Re-stat the widget file at most once a minute: it only changes at
+# deploy time, but the throttle keeps live development workable
+_WIDGET_RECHECK_SECONDS = 60.0
+
+
+def _get_widget_html() -> str | None:
+    """Return the widget HTML with the API URL injected, or None if not built.
+
+    The file read is cached by mtime and the stat itself is throttled;
+    the URL injection stays per-call because the ngrok public URL can
+    change while the server runs.
+    """
+    now = time.monotonic()
+    if (
+        _widget_cache["html"] is None
+        or now - _widget_cache["checked"] > _WIDGET_RECHECK_SECONDS
+    ):
+        _widget_cache["checked"] = now
+        try:
+            mtime = os.path.getmtime(WIDGET_PATH)
+        except OSError:
+            return None
+
+        if _widget_cache["mtime"] != mtime:
+            _widget_cache["html"] = WIDGET_PATH.read_text()
+            _widget_cache["mtime"] = mtime
+
+    if _widget_cache["html"] is None:
+        return None
+
+    widget_html = _widget_cache["html"]
+    public_url = get_public_url()
+    injection = f'<script>window.DOCX_API_URL = "{public_url}/api";</script>'
+    if "<head>" in widget_html:
+        return widget_html.replace("<head>", f"<head>{injection}")
+    return injection + widget_html
+
+
+# Fallback HTML if the widget build doesn't exist
+_FALLBACK_WIDGET_HTML = """
+<!DOCTYPE html>
+<html>
+<head><title>Document Editor</title></head>
+<body>
+    <div id="root">Widget not built yet. Run 'npm run build' in frontend/</div>
+</body>
+</html>
+"""
+
+
 @app.list_resources()
 async def list_resources() -> list[Resource]:
     """List available resources (the widget)."""
-    # Read the built widget HTML
-    widget_path = Path("../frontend/dist/index.html")
-    
-    if widget_path.exists():
-        widget_html = widget_path.read_text()
-        # Inject API base URL
-        public_url = get_public_url()
-        injection = f'<script>window.DOCX_API_URL = "{public_url}/api";</script>'
-        if "<head>" in widget_html:
-            widget_html = widget_html.replace("<head>", f"<head>{injection}")
-        else:
-            widget_html = injection + widget_html
-    else:
-        # Fallback to a simple HTML if build doesn't exist
-        widget_html = """
-        <!DOCTYPE html>
-        <html>
-        <head><title>Document Editor</title></head>
-        <body>
-            <div id="root">Widget not built yet. Run 'npm run build' in frontend/</div>
-        </body>
-        </html>
-        """
-    
+    widget_html = _get_widget_html()
+
+    if widget_html is None:
+        widget_html = _FALLBACK_WIDGET_HTML
+
     return [
         Resource(
             uri="ui://widget/document-editor.html",
@@ -277,25 +1006,17 @@ async def list_resources() -> list[Resource]:
 async def read_resource(uri: AnyUrl) -> str:
     """Read resource content."""
     if str(uri) == "ui://widget/document-editor.html":
-        # Read the widget HTML
-        widget_path = Path("../frontend/dist/index.html")
-        if widget_path.exists():
-            widget_html = widget_path.read_text()
-            # Inject API base URL (Same as list_resources)
-            public_url = get_public_url()
-            injection = f'<script>window.DOCX_API_URL = "{public_url}/api";</script>'
-            if "<head>" in widget_html:
-                return widget_html.replace("<head>", f"<head>{injection}")
-            return injection + widget_html
-            
+        widget_html = _get_widget_html()
+        if widget_html is not None:
+            return widget_html
+
         return """<!DOCTYPE html><html><body>Widget not built.</body></html>"""
     
     raise ValueError(f"Resource not found: {uri}")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available tools."""
+def _build_tools() -> list[Tool]:
+    """Build the tool definitions (static; constructed once at import)."""
     return [
         Tool(
             name="open_docxai_panel",
@@ -412,6 +1133,8 @@ You must first call upload_document to get a doc_id.
 - Analyzes document paragraphs using GPT-4o-mini
 - Generates contextual suggestions based on your request
 - Returns suggestions with original text, improved text, and reasoning
+- Processes the first 200 substantial paragraphs per analysis; re-run
+  for later sections of very long documents
 
 💡 EXAMPLE REQUESTS:
 - "Make it more formal and professional"
@@ -508,6 +1231,17 @@ You must have:
         ),
     ]
 
+
+# MCP clients call list_tools during every session handshake; reuse the
+# same Tool objects instead of reconstructing the pydantic models each time
+_TOOLS = _build_tools()
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available tools."""
+    return _TOOLS
+
 @app.list_prompts()
 async def list_prompts() -> list[Prompt]:
     """List available prompts."""
@@ -543,15 +1277,11 @@ async def list_resource_templates() -> list[ResourceTemplate]:
     return []
 
 
-@app.call_tool()
-async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool calls."""
-    
-    if name == "open_docxai_panel":
-        # Return message directing user to the panel
-        return [TextContent(
-            type="text",
-            text="""✅ DocxAI Panel is now open above!
+# Constant tool responses, built once so these paths skip per-call
+# pydantic model construction
+_PANEL_OPEN_CONTENT = TextContent(
+    type="text",
+    text="""✅ DocxAI Panel is now open above!
 
 📋 TO USE:
 1. Click the file input in the panel above
@@ -563,23 +1293,40 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
 7. Download your improved document
 
 💡 Everything happens in this panel - no need to upload to external sites!"""
-        )]
+)
+_DOC_NOT_FOUND_CONTENT = TextContent(
+    type="text",
+    text="Document not found. Please upload the document first using upload_document."
+)
+_NO_SUGGESTIONS_CONTENT = TextContent(type="text", text="Document or suggestions not found")
+
+
+@app.call_tool()
+async def call_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Handle tool calls."""
+
+    if name == "open_docxai_panel":
+        # Return message directing user to the panel
+        return [_PANEL_OPEN_CONTENT]
     
     if name == "upload_document":
         # Handle Upload Logic - file_url is required
         filename = arguments["filename"]
         file_url = arguments["file_url"]
         
-        # Download from URL
+        doc_id = uuid.uuid4().hex
+        doc_path = UPLOAD_DIR / f"{doc_id}.docx"
+
+        # Download from URL, streamed straight to disk without blocking
+        # the event loop
         try:
-            import httpx
             logger.info(f"Downloading file from URL: {file_url}")
-            
-            response = httpx.get(file_url, follow_redirects=True, timeout=30.0)
-            response.raise_for_status()
-            content = response.content
-            logger.info(f"Downloaded {len(content)} bytes from URL")
+
+            file_size = await _download_to_path(file_url, doc_path)
+            logger.info(f"Downloaded {file_size} bytes from URL")
         except Exception as e:
+            if doc_path.exists():
+                doc_path.unlink()
             return [TextContent(
                 type="text",
                 text=f"""❌ Error downloading file from URL: {str(e)}
@@ -593,34 +1340,33 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
 � TIP: If the link expired, upload the file again to file.io and get a fresh URL."""
             )]
 
-        doc_id = str(uuid.uuid4())
-        doc_path = UPLOAD_DIR / f"{doc_id}.docx"
-        
-        with open(doc_path, "wb") as f:
-            f.write(content)
-            
-        # Verify ZIP/DOCX validity
-        import zipfile
-        if not zipfile.is_zipfile(doc_path):
-             if doc_path.exists():
-                doc_path.unlink()
-             header_hex = content[:4].hex().upper()
-             return [TextContent(type="text", text=f"Error: The uploaded file is not a valid DOCX/ZIP package. Header: {header_hex}, Size: {len(content)} bytes.")]
-
-        # Extract metadata
+        # Validate and extract metadata in one pass: the ZipFile open
+        # inside extract_document_metadata doubles as the DOCX validity
+        # check, so the file isn't reopened just to sniff its header.
+        # The zip+XML parse is CPU-bound, so it runs in the process pool
+        # where concurrent uploads scale across cores instead of
+        # contending for the GIL
         try:
-            metadata = extract_document_metadata(str(doc_path))
+            metadata = await asyncio.get_running_loop().run_in_executor(
+                _get_process_pool(), extract_document_metadata, str(doc_path)
+            )
+        except (zipfile.BadZipFile, KeyError):
+            with open(doc_path, "rb") as f:
+                header_hex = f.read(4).hex().upper()
+            doc_path.unlink()
+            return [TextContent(type="text", text=f"Error: The uploaded file is not a valid DOCX/ZIP package. Header: {header_hex}, Size: {file_size} bytes.")]
         except Exception as e:
             if doc_path.exists():
                 doc_path.unlink()
             return [TextContent(type="text", text=f"Error processing document structure: {str(e)}")]
         
         # Store document info
-        documents[doc_id] = {
+        await _store_set(documents, doc_id, {
             "filename": filename,
             "path": str(doc_path),
             "metadata": metadata,
-        }
+            "download_filename": _download_filename(filename),
+        })
         
         return [
             TextContent(
@@ -634,15 +1380,17 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         doc_id = arguments["doc_id"]
         request = arguments["request"]
         
-        if doc_id not in documents:
-            return [TextContent(type="text", text="Document not found. Please upload the document first using upload_document.")]
-        
-        doc_path = documents[doc_id]["path"]
-        filename = documents[doc_id]["filename"]
-        
-        # Generate suggestions
-        suggestions = generate_suggestions(doc_path, request)
-        suggestions_store[doc_id] = suggestions
+        if not await _store_has(documents, doc_id):
+            return [_DOC_NOT_FOUND_CONTENT]
+
+        doc_info = await _store_get(documents, doc_id)
+        doc_path = doc_info["path"]
+        filename = doc_info["filename"]
+
+        # Generate suggestions; the LLM batches fan out concurrently and the
+        # rule-based fallback runs in the process pool
+        suggestions = await generate_suggestions(doc_path, request)
+        await _store_set(suggestions_index, doc_id, {s["id"]: s for s in suggestions})
         
         return [
             TextContent(
@@ -662,26 +1410,15 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         doc_id = arguments["doc_id"]
         suggestion_ids = arguments["suggestion_ids"]
         
-        if doc_id not in documents or doc_id not in suggestions_store:
-            return [TextContent(type="text", text="Document or suggestions not found")]
-        
-        # Get selected suggestions
-        all_suggestions = suggestions_store[doc_id]
-        selected = [s for s in all_suggestions if s["id"] in suggestion_ids]
-        
-        # Apply changes
-        doc_path = documents[doc_id]["path"]
-        modified_path = apply_changes_to_document(doc_path, selected)
+        if not await _store_has(documents, doc_id) or not await _store_has(suggestions_index, doc_id):
+            return [_NO_SUGGESTIONS_CONTENT]
+
+        # Get selected suggestions via the id index, deduplicating the
+        # requested ids while preserving their order
+        by_id = await _store_get(suggestions_index, doc_id)
+        selected = [by_id[sid] for sid in dict.fromkeys(suggestion_ids) if sid in by_id]
         
-        # Create a user-friendly filename based on original filename
-        original_filename = documents[doc_id]["filename"]
-        # Remove .docx extension if present, add _modified, then add .docx
-        base_name = original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename
-        download_filename = f"{base_name}_modified.docx"
-
-        # Store modified document path and download filename
-        documents[doc_id]["modified_path"] = modified_path
-        documents[doc_id]["download_filename"] = download_filename
+        await _apply_selected(doc_id, selected)
         
         # Use valid public URL for download
         base_url = get_public_url()
@@ -703,29 +1440,30 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
 
-from fastapi import FastAPI, Request as FastAPIRequest, UploadFile, File
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Request as FastAPIRequest, Response, UploadFile, File
+from fastapi.responses import ORJSONResponse, FileResponse, StreamingResponse
+from pydantic import BaseModel
 from starlette.routing import Mount
 from mcp.server.sse import SseServerTransport
 import uvicorn
-import logging
-
-# ... existing code ...
 
-# Configure Logging to File
+# Configure Logging to File. This is the single basicConfig call: the
+# duplicate INFO-level one at the top of the file configured the root
+# logger first and forced this one to tear it down again via force=True
 logging.basicConfig(
     level=logging.DEBUG,
     filename="server.log",
     filemode="a",
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    force=True
 )
-logger = logging.getLogger("server")
 
 # SSE transport instance
 sse_transport = SseServerTransport("/sse/messages")
 
+# Initialization options don't change per connection; build the pydantic
+# object once instead of per SSE client
+_INIT_OPTS = app.create_initialization_options()
+
 async def handle_mcp_sse(scope, receive, send):
     """
     Combined ASGI handler for MCP SSE (Connection & Messages).
@@ -755,7 +1493,7 @@ async def handle_mcp_sse(scope, receive, send):
          # Logic for connection (GET /sse)
          logger.debug("Handling SSE connection")
          async with sse_transport.connect_sse(scope, receive, send) as streams:
-             await app.run(streams[0], streams[1], app.create_initialization_options())
+             await app.run(streams[0], streams[1], _INIT_OPTS)
 
 # Initialize FastAPI app
 fastapi_app = FastAPI(
@@ -764,18 +1502,78 @@ fastapi_app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    # orjson renders the large suggestion payloads 2-5x faster than
+    # stdlib json
+    default_response_class=ORJSONResponse,
 )
 
+class FastCORSMiddleware:
+    """Minimal CORS middleware with a precomputed preflight response.
+
+    Starlette's CORSMiddleware re-parses headers and rebuilds header dicts
+    on every request; here the preflight answer is cached bytes and other
+    responses just get the allow-origin header appended on the way out.
+
+    Allowed origins come from ALLOWED_ORIGINS (comma-separated). The
+    default stays the wildcard for ChatGPT-hosted widget compatibility;
+    deployments that know their frontend origin should narrow it.
+    """
+
+    _PREFLIGHT_BASE = [
+        (b"access-control-allow-methods", b"*"),
+        (b"access-control-allow-headers", b"*"),
+        (b"access-control-max-age", b"86400"),
+    ]
+
+    def __init__(self, app):
+        self.app = app
+        origins = os.getenv("ALLOWED_ORIGINS", "*")
+        self._allow_any = origins.strip() == "*"
+        self._allowed = {o.strip().encode() for o in origins.split(",") if o.strip()}
+
+    def _acao_header(self, scope):
+        """Allow-origin header for this request, or None if not allowed."""
+        if self._allow_any:
+            return (b"access-control-allow-origin", b"*")
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                if value in self._allowed:
+                    return (b"access-control-allow-origin", value)
+                return None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        acao = self._acao_header(scope)
+
+        if scope["method"] == "OPTIONS":
+            headers = self._PREFLIGHT_BASE + ([acao] if acao else [])
+            await send({
+                "type": "http.response.start",
+                "status": 204,
+                "headers": headers,
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if acao is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), acao]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
 # Configure CORS
-fastapi_app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
+fastapi_app.add_middleware(FastCORSMiddleware)
 
 @fastapi_app.get("/", tags=["Health"])
 @fastapi_app.get("/api", tags=["Health"])
@@ -786,89 +1584,186 @@ async def handle_root():
 @fastapi_app.post("/api/upload", tags=["Documents"])
 async def handle_upload(file: UploadFile = File(...)):
     """REST endpoint to upload a document."""
-    content = await file.read()
     filename = file.filename
-    
+
     # Create doc_id and save
-    doc_id = str(uuid.uuid4())
+    doc_id = uuid.uuid4().hex
     doc_path = UPLOAD_DIR / f"{doc_id}.docx"
-    
-    with open(doc_path, "wb") as f:
-        f.write(content)
-    
-    # Extract metadata
-    metadata = extract_document_metadata(str(doc_path))
+
+    # Stream the multipart body to disk in 1 MiB chunks: peak memory is one
+    # chunk instead of 2x the file size, and the network receive overlaps
+    # the (page-cached, sub-ms) writes
+    with open(doc_path, "wb") as out:
+        while chunk := await file.read(1 << 20):
+            out.write(chunk)
+
+    # Extract metadata in the process pool so parallel uploads parse on
+    # separate cores rather than serializing on the GIL
+    metadata = await asyncio.get_running_loop().run_in_executor(
+        _get_process_pool(), extract_document_metadata, str(doc_path)
+    )
     
     # Store document info
-    documents[doc_id] = {
+    await _store_set(documents, doc_id, {
         "filename": filename,
         "path": str(doc_path),
         "metadata": metadata,
-    }
-    
+        "download_filename": _download_filename(filename),
+    })
+
     return {
         "doc_id": doc_id,
         "filename": filename,
         "metadata": metadata
     }
 
+class AnalyzeRequest(BaseModel):
+    """Body of /api/analyze; validated in pydantic-core before the handler runs."""
+    doc_id: str
+    request: str
+    mode: str | None = None
+
+
+class ApplyRequest(BaseModel):
+    """Body of /api/apply."""
+    doc_id: str
+    suggestion_ids: list[str] = []
+    mode: str | None = None
+
+
 @fastapi_app.post("/api/analyze", tags=["Analysis"])
-async def handle_analyze(request: FastAPIRequest):
+async def handle_analyze(payload: AnalyzeRequest):
     """REST endpoint to analyze document and get suggestions."""
-    data = await request.json()
-    doc_id = data.get("doc_id")
-    edit_request = data.get("request")
-    
-    if not doc_id or not edit_request:
-        return JSONResponse({"error": "Missing doc_id or request"}, status_code=400)
-    
-    if doc_id not in documents:
-        return JSONResponse({"error": "Document not found"}, status_code=404)
-    
-    doc_path = documents[doc_id]["path"]
-    suggestions = generate_suggestions(doc_path, edit_request)
-    
-    # Store suggestions
-    suggestions_store[doc_id] = suggestions
-    
+    doc_id = payload.doc_id
+    edit_request = payload.request
+
+    if not await _store_has(documents, doc_id):
+        return ORJSONResponse({"error": "Document not found"}, status_code=404)
+
+    doc_info = await _store_get(documents, doc_id)
+    doc_path = doc_info["path"]
+
+    # Non-interactive analyses can opt into the Batch API (~50% cost, no
+    # RPM pressure); results are collected via /api/analyze_status
+    if payload.mode == "batch":
+        batch_id, batches = await start_batch_analysis(doc_path, edit_request)
+        doc_info["batch_state"] = {"batch_id": batch_id, "batches": batches}
+        await _store_set(documents, doc_id, doc_info)
+        return {
+            "doc_id": doc_id,
+            "batch_id": batch_id,
+            "status_url": f"/api/analyze_status/{doc_id}",
+        }
+
+    # Streaming mode: one NDJSON line per suggestion as each batch lands,
+    # so the client renders early and the server never buffers the full
+    # response. The index is stored before the terminating done line, so
+    # /api/apply is valid as soon as the client sees it.
+    if payload.mode == "stream":
+        async def _ndjson():
+            index = {}
+            async for chunk in _iter_suggestion_batches(doc_path, edit_request):
+                for suggestion in chunk:
+                    index[suggestion["id"]] = suggestion
+                    yield orjson.dumps(suggestion) + b"\n"
+            await _store_set(suggestions_index, doc_id, index)
+            yield orjson.dumps({"done": True, "count": len(index)}) + b"\n"
+
+        return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+    suggestions = await generate_suggestions(doc_path, edit_request)
+
+    # Store suggestions, keyed by id for O(1) apply lookups
+    await _store_set(suggestions_index, doc_id, {s["id"]: s for s in suggestions})
+
     return {
         "doc_id": doc_id,
         "suggestions": suggestions,
         "count": len(suggestions)
     }
 
+@fastapi_app.get("/api/analyze_status/{doc_id}", tags=["Analysis"])
+async def handle_analyze_status(doc_id: str):
+    """REST endpoint to poll a Batch API analysis started via mode=batch."""
+    if not await _store_has(documents, doc_id):
+        return ORJSONResponse({"error": "Document not found"}, status_code=404)
+
+    batch_state = (await _store_get(documents, doc_id)).get("batch_state")
+    if not batch_state:
+        return ORJSONResponse({"error": "No batch analysis for this document"}, status_code=404)
+
+    status, suggestions = await collect_batch_analysis(
+        batch_state["batch_id"], batch_state["batches"]
+    )
+    if status != "completed":
+        return {"doc_id": doc_id, "status": status}
+
+    # Store suggestions so /api/apply works the same as the interactive path
+    await _store_set(suggestions_index, doc_id, {s["id"]: s for s in suggestions})
+
+    return {
+        "doc_id": doc_id,
+        "status": status,
+        "suggestions": suggestions,
+        "count": len(suggestions),
+    }
+
+
 @fastapi_app.post("/api/apply", tags=["Modifications"])
-async def handle_apply(request: FastAPIRequest):
+async def handle_apply(payload: ApplyRequest):
     """REST endpoint to apply selected suggestions."""
-    data = await request.json()
-    doc_id = data.get("doc_id")
-    suggestion_ids = data.get("suggestion_ids", [])
-    
-    if not doc_id:
-        return JSONResponse({"error": "Missing doc_id"}, status_code=400)
-    
-    if doc_id not in documents or doc_id not in suggestions_store:
-        return JSONResponse({"error": "Document or suggestions not found"}, status_code=404)
-    
-    # Get selected suggestions
-    all_suggestions = suggestions_store[doc_id]
-    selected = [s for s in all_suggestions if s["id"] in suggestion_ids]
+    doc_id = payload.doc_id
+    suggestion_ids = payload.suggestion_ids
+
+    if not await _store_has(documents, doc_id) or not await _store_has(suggestions_index, doc_id):
+        return ORJSONResponse({"error": "Document or suggestions not found"}, status_code=404)
+
+    # Resolve ids through the per-document index built at analyze time:
+    # O(1) per id instead of rescanning the suggestions list, with
+    # dict.fromkeys deduplicating while preserving order
+    by_id = await _store_get(suggestions_index, doc_id)
+    selected = [by_id[sid] for sid in dict.fromkeys(suggestion_ids) if sid in by_id]
     
     if not selected:
-        return JSONResponse({"error": "No valid suggestions selected"}, status_code=400)
-    
-    # Apply changes
-    doc_path = documents[doc_id]["path"]
-    modified_path = apply_changes_to_document(doc_path, selected)
-    
-    # Create a user-friendly filename
-    original_filename = documents[doc_id]["filename"]
-    base_name = original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename
-    download_filename = f"{base_name}_modified.docx"
-    
-    documents[doc_id]["modified_path"] = modified_path
-    documents[doc_id]["download_filename"] = download_filename
+        return ORJSONResponse({"error": "No valid suggestions selected"}, status_code=400)
     
+    # Background mode: acknowledge with 202 and let the rewrite finish in
+    # a task; the download route answers 425 until the result lands. The
+    # registry self-cleans via the done callback
+    if payload.mode == "background":
+        # Dedup only resubmits of the identical selection; a different
+        # selection gets its own task, serialized by the per-doc lock
+        task_key = (doc_id, _selection_key(selected))
+        if task_key not in _apply_tasks or _apply_tasks[task_key].done():
+            # Mark the pending apply in the shared record before the task
+            # starts: the local registry is invisible to sibling workers,
+            # so without this a download poll routed elsewhere would serve
+            # the previous selection's file with a 200
+            doc_info = await _store_get(documents, doc_id)
+            doc_info["pending_apply"] = doc_info.get("pending_apply", 0) + 1
+            await _store_set(documents, doc_id, doc_info)
+
+            task = asyncio.create_task(_apply_selected(doc_id, selected, background=True))
+
+            def _done(t, task_key=task_key):
+                _apply_tasks.pop(task_key, None)
+                if not t.cancelled() and t.exception():
+                    logger.error("Background apply for %s failed: %s", task_key[0], t.exception())
+
+            task.add_done_callback(_done)
+            _apply_tasks[task_key] = task
+        return ORJSONResponse(
+            {
+                "success": True,
+                "status": "processing",
+                "applied_count": len(selected),
+                "download_url": f"/api/download/{doc_id}",
+            },
+            status_code=202,
+        )
+
+    await _apply_selected(doc_id, selected)
+
     return {
         "success": True,
         "applied_count": len(selected),
@@ -876,26 +1771,72 @@ async def handle_apply(request: FastAPIRequest):
     }
 
 @fastapi_app.get("/api/download/{doc_id}", tags=["Documents"])
-async def handle_download(doc_id: str):
+async def handle_download(doc_id: str, request: FastAPIRequest):
     """REST endpoint to download modified document."""
-    if doc_id not in documents:
-        return JSONResponse({"error": "Document not found"}, status_code=404)
-    
-    modified_path = documents[doc_id].get("modified_path")
-    if not modified_path or not Path(modified_path).exists():
-        return JSONResponse({"error": "Modified document not found"}, status_code=404)
-    
-    download_filename = documents[doc_id].get("download_filename", "modified_document.docx")
-    
+    if not await _store_has(documents, doc_id):
+        return ORJSONResponse({"error": "Document not found"}, status_code=404)
+
+    if _pending_apply(doc_id):
+        return ORJSONResponse({"error": "Apply still in progress"}, status_code=425)
+
+    doc_info = await _store_get(documents, doc_id)
+    # Shared-state gate for multi-worker deployments: a background apply
+    # accepted by a sibling worker is invisible to this process's task
+    # registry but shows up in the record's counter
+    if doc_info.get("pending_apply"):
+        return ORJSONResponse({"error": "Apply still in progress"}, status_code=425)
+
+    modified_path = doc_info.get("modified_path")
+    if not modified_path:
+        return ORJSONResponse({"error": "Modified document not found"}, status_code=404)
+
+    try:
+        # One stat serves as the existence check and pre-resolves the
+        # metadata FileResponse needs for Content-Length/Accept-Ranges,
+        # unlocking the server's sendfile fast path
+        stat_result = os.stat(modified_path)
+    except OSError:
+        return ORJSONResponse({"error": "Modified document not found"}, status_code=404)
+
+    # mtime+size fingerprint: apply writes a new file per selection, so
+    # this pins the content without hashing it. A matching If-None-Match
+    # skips the whole transfer for polling or retrying clients
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    download_filename = doc_info.get("download_filename", "modified_document.docx")
+
     return FileResponse(
         path=str(modified_path),
         filename=download_filename,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        stat_result=stat_result,
+        headers={"ETag": etag, "Cache-Control": "private, max-age=60"},
     )
 
+@fastapi_app.on_event("shutdown")
+async def shutdown_process_pool():
+    """Stop worker processes cleanly when the server exits."""
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+
+
 # Mount MCP SSE handler
 fastapi_app.mount("/sse", handle_mcp_sse)
 
 if __name__ == "__main__":
-    uvicorn.run(fastapi_app, host="0.0.0.0", port=8787)
+    # uvloop's C-level loop and httptools' parser cut per-event latency for
+    # the many small SSE sends compared to the default asyncio loop.
+    # WEB_CONCURRENCY > 1 scales the I/O endpoints across cores, but only
+    # makes sense with REDIS_URL set: the in-memory stores are per-process.
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        "server:fastapi_app" if workers > 1 else fastapi_app,
+        host="0.0.0.0",
+        port=8787,
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+    )
 
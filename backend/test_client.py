@@ -1,66 +1,95 @@
 import asyncio
+import functools
 import logging
+
+# pybase64 is a drop-in SIMD replacement for the stdlib codec; fall back
+# silently when it isn't installed
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 from mcp.client.session import ClientSession
 from mcp.client.sse import sse_client
+from mcp.shared.exceptions import McpError
 
 # logging.basicConfig(level=logging.DEBUG)
 
+# The document body is static, so the serialized bytes are too: cache the
+# result and repeated/parametric runs in one process skip the ~30-part zip
+# save entirely
+@functools.lru_cache(maxsize=None)
+def build_docx():
+    """Create a dummy docx in memory and return it base64-encoded."""
+    import io
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument()
+    doc.add_paragraph("Test document content.")
+    bio = io.BytesIO()
+    doc.save(bio)
+    # getvalue() hands back the internal buffer without the
+    # seek+read copy
+    return base64.b64encode(bio.getvalue()).decode('ascii')
+
 async def test_live_connection():
     sse_url = "https://beata-discriminantal-sirena.ngrok-free.dev/sse"
     print(f"🔌 Connecting to {sse_url} ...")
-    try:
-        async with sse_client(sse_url) as (read_stream, write_stream):
-            print("✅ Transport Connected!")
-            async with ClientSession(read_stream, write_stream) as session:
-                print("🔄 Initializing Session...")
-                await session.initialize()
-                print("✅ Session Initialized!")
-                print("📨 Sending 'list_tools' request...")
-                tools = await session.list_tools()
-                print(f"🎉 Received Response: Found {len(tools.tools)} tools")
-                for tool in tools.tools:
-                    print(f"   - 🛠️  {tool.name}")
-                
-                print("📨 Sending 'call_tool' (upload_document) request...")
-                
-                # Create a dummy docx in memory
-                import io, base64
-                from docx import Document as DocxDocument
-                
-                doc = DocxDocument()
-                doc.add_paragraph("Test document content.")
-                bio = io.BytesIO()
-                doc.save(bio)
-                bio.seek(0)
-                b64_content = base64.b64encode(bio.read()).decode('utf-8')
-                
-                # Upload & Analyze in one step
-                try:
-                    print(f"⏳ Calling 'analyze_document'...")
-                    result = await session.call_tool("analyze_document", arguments={
-                        "filename": "test_verification.docx",
-                        "content": b64_content,
-                        "request": "Make it more formal"
-                    })
-                    print(f"🎉 Tool Call Success!")
-                    for content in result.content:
-                        if content.type == "text":
-                            print(f"   Text Response Length: {len(content.text)}")
-                            if hasattr(content, "annotations") and content.annotations:
-                                print(f"   Annotations Type: {type(content.annotations)}")
-                                print(f"   Annotations: {content.annotations}")
-                except Exception as e:
-                    print(f"❌ Tool Call Failed: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    return False
+    # No blanket try/except around the exchange: a genuine transport
+    # failure gets the native traceback, and the success path pays no
+    # exception machinery
+    async with sse_client(sse_url) as (read_stream, write_stream):
+        print("✅ Transport Connected!")
+        async with ClientSession(read_stream, write_stream) as session:
+            print("🔄 Initializing Session...")
+            await session.initialize()
+            print("✅ Session Initialized!")
+            print("📨 Sending 'list_tools' request...")
+            # docx construction is CPU-bound and independent of the
+            # list_tools round-trip; run it in a thread so it overlaps
+            # the network RTT instead of blocking SSE reads
+            tools, b64_content = await asyncio.gather(
+                session.list_tools(),
+                asyncio.to_thread(build_docx),
+            )
+            print(f"🎉 Received Response: Found {len(tools.tools)} tools")
+            for tool in tools.tools:
+                print(f"   - 🛠️  {tool.name}")
+
+            print("📨 Sending 'call_tool' (upload_document) request...")
 
-                return True
-    except Exception as e:
-        print(f"❌ Connection Failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+            # Upload & Analyze in one step
+            print(f"⏳ Calling 'analyze_document'...")
+            try:
+                result = await session.call_tool("analyze_document", arguments={
+                    "filename": "test_verification.docx",
+                    "content": b64_content,
+                    "request": "Make it more formal"
+                })
+            except McpError as e:
+                print(f"❌ Tool Call Failed: {e}")
+                return False
+            # tool-level failures come back as a result flag, not an
+            # exception
+            if result.isError:
+                print(f"❌ Tool Call Failed: {result.content}")
+                return False
+            print(f"🎉 Tool Call Success!")
+            for content in result.content:
+                if content.type == "text":
+                    print(f"   Text Response Length: {len(content.text)}")
+                    if hasattr(content, "annotations") and content.annotations:
+                        print(f"   Annotations Type: {type(content.annotations)}")
+                        print(f"   Annotations: {content.annotations}")
+
+            return True
 
 if __name__ == "__main__":
+    # SSE does many small reads; uvloop cuts per-read selector overhead
+    # (same switch the server makes in uvicorn.run)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(test_live_connection())
@@ -1,66 +1,103 @@
+import functools
+import os
 import re
 from pathlib import Path
 
+# Single alternation handles both asset kinds, so the HTML is scanned
+# once instead of once per pattern; compiled at import. Byte patterns
+# keep the whole pipeline binary, skipping a UTF-8 decode/encode of the
+# full document
+# <link rel="stylesheet" crossorigin href="/assets/index-hNH8n-MC.css">
+# <script type="module" crossorigin src="/assets/index-DWFRgM31.js"></script>
+ASSET_PATTERN = re.compile(
+    rb'(?P<css><link rel="stylesheet"[^>]*href="(?P<href>[^"]+)"[^>]*>)'
+    rb'|(?P<js><script[^>]*src="(?P<src>[^"]+)"[^>]*></script>)'
+)
+
+# Vite builds can reference the same bundle from several tags (preload,
+# stylesheet, modulepreload); memoize so each file is read from disk once
+@functools.lru_cache(maxsize=None)
+def _load(path_str: str) -> bytes:
+    return Path(path_str).read_bytes()
+
 def inline_assets():
     dist_dir = Path("frontend/dist")
     index_path = dist_dir / "index.html"
-    
+
     if not index_path.exists():
         print("❌ Error: frontend/dist/index.html not found. Run 'npm run build' first.")
         return
 
-    content = index_path.read_text()
-    
-    # Inline CSS
-    # <link rel="stylesheet" crossorigin href="/assets/index-hNH8n-MC.css">
-    css_pattern = r'<link rel="stylesheet"[^>]*href="([^"]+)"[^>]*>'
-    
-    def repl_css(match):
-        href = match.group(1)
-        # href might be /assets/... or ./assets/...
-        filename = Path(href).name
-        # Find file in assets dir
-        assets = list(dist_dir.glob(f"**/assets/{filename}"))
-        if not assets:
-            assets = list(dist_dir.glob(f"**/{filename}"))
-            
-        if assets:
-            print(f"✅ Inlining CSS: {assets[0].name}")
-            css_content = assets[0].read_text()
-            return f'<style>\n{css_content}\n</style>'
-        else:
-            print(f"⚠️ Warning: CSS file not found for {href}")
-            return match.group(0)
+    content = index_path.read_bytes()
 
-    content = re.sub(css_pattern, repl_css, content)
+    # Vite emits bundles under dist/assets/, so the common case is a
+    # single stat on that path. The full tree walk below is the fallback
+    # for assets living elsewhere, built lazily on the first miss: one
+    # os.scandir pass in string paths, with files under an assets/
+    # directory winning naming conflicts (matching the old glob
+    # preference)
+    assets_dir = os.path.join(str(dist_dir), "assets")
+    asset_index = None
 
-    # Inline JS
-    # <script type="module" crossorigin src="/assets/index-DWFRgM31.js"></script>
-    js_pattern = r'<script[^>]*src="([^"]+)"[^>]*></script>'
-    
-    def repl_js(match):
-        src = match.group(1)
-        filename = Path(src).name
-        assets = list(dist_dir.glob(f"**/assets/{filename}"))
-        if not assets:
-            assets = list(dist_dir.glob(f"**/{filename}"))
-            
-        if assets:
-            print(f"✅ Inlining JS: {assets[0].name}")
-            js_content = assets[0].read_text()
-            # Remove import/export if needed? Vite production build usually bundles everything.
-            # But type="module" might be tricky if we inline without changing type?
-            # Actually, standard <script> works better if code is bundled.
-            # But let's keep type="module" if it was there, or just remove src.
-            return f'<script type="module">\n{js_content}\n</script>'
+    def _build_index():
+        index = {}
+        stack = [str(dist_dir)]
+        while stack:
+            d = stack.pop()
+            in_assets = os.path.basename(d) == "assets"
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif in_assets or e.name not in index:
+                        index[e.name] = e.path
+        return index
+
+    def _find_asset(filename):
+        nonlocal asset_index
+        candidate = os.path.join(assets_dir, filename)
+        if os.path.isfile(candidate):
+            return candidate
+        if asset_index is None:
+            asset_index = _build_index()
+        return asset_index.get(filename)
+
+    def repl_asset(match):
+        if match.group("css") is not None:
+            ref, kind = match.group("href"), "CSS"
         else:
-            print(f"⚠️ Warning: JS file not found for {src}")
+            ref, kind = match.group("src"), "JS"
+        # ref might be /assets/... or ./assets/...
+        filename = Path(ref.decode()).name
+        asset = _find_asset(filename)
+
+        if not asset:
+            print(f"⚠️ Warning: {kind} file not found for {ref.decode()}")
             return match.group(0)
 
-    content = re.sub(js_pattern, repl_js, content)
+        print(f"✅ Inlining {kind}: {filename}")
+        if kind == "CSS":
+            return b'<style>\n' + _load(asset) + b'\n</style>'
+        # Remove import/export if needed? Vite production build usually bundles everything.
+        # But type="module" might be tricky if we inline without changing type?
+        # Actually, standard <script> works better if code is bundled.
+        # But let's keep type="module" if it was there, or just remove src.
+        return b'<script type="module">\n' + _load(asset) + b'\n</script>'
+
+    # Assemble the result explicitly: collect slices and replacements in
+    # a list and join once, so the large inlined bundles never go through
+    # intermediate buffer growth
+    parts = []
+    last = 0
+    for m in ASSET_PATTERN.finditer(content):
+        parts.append(content[last:m.start()])
+        parts.append(repl_asset(m))
+        last = m.end()
+    parts.append(content[last:])
+    content = b''.join(parts)
 
     # Save back
-    index_path.write_text(content)
+    index_path.write_bytes(content)
     print(f"🎉 Successfully inlined assets into {index_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Regression test for paragraph text extraction in backend/server.py.
+Guards against the itertext() corruption where python-docx's .text
+overrides made every run's text repeat in the cached paragraph texts.
+"""
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+DOC_FILE = SCRIPT_DIR / "tests" / "1" / "Azure.docx"
+
+sys.path.insert(0, str(SCRIPT_DIR / "backend"))
+
+def test_cached_texts_match_paragraph_text():
+    """The cached texts must equal p.text for every paragraph."""
+    from docx import Document
+    from server import _get_doc
+
+    print(f"Checking cached paragraph texts for {DOC_FILE.name}")
+
+    _, cached_texts = _get_doc(str(DOC_FILE))
+    expected = [p.text for p in Document(str(DOC_FILE)).paragraphs]
+
+    if len(cached_texts) != len(expected):
+        print(f"❌ Paragraph count mismatch: {len(cached_texts)} != {len(expected)}")
+        return False
+
+    for idx, (got, want) in enumerate(zip(cached_texts, expected)):
+        if got != want:
+            print(f"❌ Paragraph {idx} corrupted: {len(got)} chars vs {len(want)} expected")
+            return False
+
+    print(f"✅ All {len(expected)} paragraph texts match p.text")
+    return True
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Paragraph Extraction Regression Test")
+    print("=" * 60)
+
+    passed = test_cached_texts_match_paragraph_text()
+
+    print("\n" + "=" * 60)
+    if passed:
+        print("✅ All tests passed!")
+        sys.exit(0)
+    else:
+        print("❌ Some tests failed")
+        sys.exit(1)
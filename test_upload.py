@@ -2,9 +2,22 @@
 """
 Test script to verify URL upload functionality
 """
+import atexit
 import httpx
 import sys
 
+# One shared client: keep-alive (and HTTP/2 when the h2 extra is
+# installed) means follow-up requests skip the TCP+TLS handshake
+try:
+    CLIENT = httpx.Client(http2=True, follow_redirects=True, timeout=30.0)
+except ImportError:
+    CLIENT = httpx.Client(follow_redirects=True, timeout=30.0)
+atexit.register(CLIENT.close)
+
+# Anything shorter than this is assumed to be a truncated base64 payload
+# (complete DOCX files encode to well past this size)
+_TRUNC_THRESHOLD = 1000
+
 def test_url_download():
     """Test downloading a file from a URL"""
     # Use the local test file via a simple HTTP server or a real public URL
@@ -14,19 +27,20 @@ def test_url_download():
     print(f"Testing URL download from: {test_url}")
     
     try:
-        response = httpx.get(test_url, follow_redirects=True, timeout=30.0)
-        response.raise_for_status()
-        
-        content = response.content
-        print(f"✅ Successfully downloaded {len(content)} bytes")
-        
-        # Verify it's a valid ZIP/DOCX file
-        if content[:4] == b'PK\x03\x04':
-            print("✅ File has valid ZIP/DOCX header")
-        else:
-            print(f"❌ Invalid file header: {content[:4].hex()}")
-            return False
-        
+        # Stream into a bytearray: peak memory is one chunk above the
+        # accumulated body, and the ZIP header check fails fast on the
+        # first chunk instead of after the full download
+        buf = bytearray()
+        with CLIENT.stream("GET", test_url) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes(65536):
+                if not buf and chunk[:4] != b'PK\x03\x04':
+                    print(f"❌ Invalid file header: {bytes(chunk[:4]).hex()}")
+                    return False
+                buf.extend(chunk)
+
+        print(f"✅ Successfully downloaded {len(buf)} bytes")
+        print("✅ File has valid ZIP/DOCX header")
         return True
         
     except Exception as e:
@@ -40,8 +54,8 @@ def test_base64_truncation_detection():
     
     print(f"\nTesting truncation detection with {len(truncated_base64)} chars")
     
-    if len(truncated_base64) < 1000:
-        print("✅ Truncation would be detected (< 1000 chars)")
+    if len(truncated_base64) < _TRUNC_THRESHOLD:
+        print(f"✅ Truncation would be detected (< {_TRUNC_THRESHOLD} chars)")
         return True
     else:
         print("❌ Truncation would NOT be detected")